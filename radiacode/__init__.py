@@ -1,3 +1,3 @@
 from radiacode.bytes_buffer import BytesBuffer
-from radiacode.radiacode import spectrum_channel_to_energy, RadiaCode
+from radiacode.radiacode import spectrum_channel_to_energy, ProtocolError, RadiaCode
 from radiacode.types import *
@@ -1,24 +1,44 @@
 import struct
+from typing import Union
+
+_U32 = struct.Struct('<I')
+_U32_ARRAYS: dict[int, struct.Struct] = {}
 
 
 class BytesBuffer:
-    def __init__(self, data: bytes):
+    def __init__(self, data: Union[bytes, bytearray, memoryview]):
         self._data = data
         self._pos = 0
+        self._limit = len(data)
 
     def size(self):
-        return len(self._data) - self._pos
+        return self._limit - self._pos
 
-    def data(self):
-        return self._data[self._pos :]
+    def data(self) -> bytes:
+        return bytes(self._data[self._pos : self._limit])
 
     def unpack(self, fmt):
         sz = struct.calcsize(fmt)
-        if self._pos + sz > len(self._data):
-            raise Exception(f'BytesBuffer: {sz} bytes required for {fmt}, but have only {len(self._data) - self._pos}')
+        if self._pos + sz > self._limit:
+            raise Exception(f'BytesBuffer: {sz} bytes required for {fmt}, but have only {self._limit - self._pos}')
         self._pos += sz
         return struct.unpack_from(fmt, self._data, self._pos - sz)
 
+    def unpack_struct(self, st: struct.Struct):
+        if self._pos + st.size > self._limit:
+            raise Exception(f'BytesBuffer: {st.size} bytes required for {st.format}, but have only {self._limit - self._pos}')
+        self._pos += st.size
+        return st.unpack_from(self._data, self._pos - st.size)
+
+    def unpack_u32(self) -> int:
+        return self.unpack_struct(_U32)[0]
+
+    def unpack_all_u32(self, n: int) -> tuple[int, ...]:
+        st = _U32_ARRAYS.get(n)
+        if st is None:
+            st = _U32_ARRAYS[n] = struct.Struct(f'<{n}I')
+        return self.unpack_struct(st)
+
     def unpack_string(self) -> str:
         slen = self.unpack('<B')[0]
         return self.unpack(f'<{slen}s')[0].decode('ascii')
@@ -6,10 +6,9 @@ from radiacode.types import Spectrum
 
 
 def decode_counts_v0(br: BytesBuffer) -> List[int]:
-    ret = []
-    while br.size() > 0:
-        ret.append(br.unpack('<I')[0])
-    return ret
+    if br.size() % 4 != 0:
+        raise Exception(f'decode_counts_v0: {br.size()} bytes is not a whole number of u32 counts')
+    return list(br.unpack_all_u32(br.size() // 4))
 
 
 def decode_counts_v1(br: BytesBuffer) -> List[int]:
@@ -1,31 +1,92 @@
 # Import necessary modules
+import codecs
 import datetime
+import re
 import struct
-from typing import List, Optional, Union
+from collections import deque
+from functools import reduce
+from operator import or_
+from typing import TYPE_CHECKING, Deque, List, Optional, Tuple, Union
 
 # Importing specific functions and types from other modules
-from radiacode.bytes_buffer import BytesBuffer
+from radiacode.bytes_buffer import _U32, BytesBuffer
 from radiacode.decoders.databuf import decode_VS_DATA_BUF
 from radiacode.decoders.spectrum import decode_RC_VS_SPECTRUM
 from radiacode.transports.bluetooth import Bluetooth
 from radiacode.transports.usb import Usb
 from radiacode.types import CTRL, VS, VSFR, DisplayDirection, DoseRateDB, Event, RareData, RawData, RealTimeData, Spectrum
 
+if TYPE_CHECKING:
+    import numpy as np
+
+# Prebuilt codecs for the request/response hot paths
+_REQ_HDR = struct.Struct('<I2sBB')
+_HDR = struct.Struct('<4s')
+_II = struct.Struct('<II')
+_FFF = struct.Struct('<fff')
+_LT = struct.Struct('<BBBBBBBB')
+
+# Codecs resolved once instead of on every decode() call
+_cp1251_decode = codecs.lookup('cp1251').decode
+_ascii_decode = codecs.lookup('ascii').decode
+
+# SpecFormatVersion=<n> line of the raw (undecoded) device configuration
+_SPEC_FORMAT_VERSION_RE = re.compile(rb'^SpecFormatVersion\s*=\s*(\d+)', re.M)
+
+# Max. number of requests execute_pipelined() keeps in flight
+_PIPELINE_DEPTH = 2
+
+# Max. number of unread execute_nowait() responses before they are drained
+_MAX_UNREAD_ACKS = 4
+
+
+class ProtocolError(Exception):
+    """Raised when a device response does not match the request it answers"""
+
+
 # Function to convert spectrum channel number to energy
-def spectrum_channel_to_energy(channel_number: int, a0: float, a1: float, a2: float) -> float:
+def spectrum_channel_to_energy(
+    channel_number: Union[int, 'np.ndarray'], a0: float, a1: float, a2: float
+) -> Union[float, 'np.ndarray']:
     """
     Calculate energy from spectrum channel number using provided coefficients.
+
+    channel_number may also be a NumPy array of channel numbers; the energies for all
+    of them are then computed in a single vectorized expression.
     
     Args:
-        channel_number (int): The channel number.
+        channel_number (Union[int, np.ndarray]): The channel number(s).
         a0 (float): Coefficient a0.
         a1 (float): Coefficient a1.
         a2 (float): Coefficient a2.
         
     Returns:
-        float: Energy corresponding to the channel number.
+        Union[float, np.ndarray]: Energy corresponding to the channel number(s).
     """
-    return a0 + a1 * channel_number + a2 * channel_number * channel_number
+    return a0 + channel_number * (a1 + a2 * channel_number)
+
+
+def _local_time_args(dt: datetime.datetime) -> bytes:
+    return _LT.pack(dt.day, dt.month, dt.year - 2000, 0, dt.second, dt.minute, dt.hour, 0)
+
+
+def _write_request_args(command_id: Union[int, VSFR], data: Optional[bytes] = None) -> bytes:
+    return _U32.pack(int(command_id)) + (data or b'')
+
+
+def _decode_fw_version(r: BytesBuffer) -> tuple[tuple[int, int, str], tuple[int, int, str]]:
+    boot_minor, boot_major = r.unpack('<HH')
+    boot_date = r.unpack_string()
+    target_minor, target_major = r.unpack('<HH')
+    target_date = r.unpack_string()
+    assert r.size() == 0
+    return ((boot_major, boot_minor, boot_date), (target_major, target_minor, target_date.strip('\x00')))
+
+
+def _check_write_response(r: BytesBuffer) -> None:
+    retcode = r.unpack_u32()
+    assert retcode == 1
+    assert r.size() == 0
 
 
 class RadiaCode:
@@ -36,10 +97,25 @@ class RadiaCode:
     Attributes:
         _connection (Union[Bluetooth, Usb]): Connection type (Bluetooth or USB).
         _seq (int): Sequence number for requests.
+        _inflight (Deque[bytes]): Headers of sent requests awaiting a response.
         _base_time (datetime.datetime): Base time for device operations.
         _spectrum_format_version (int): Version of spectrum format used.
+        _configuration_raw (Optional[bytes]): Cached undecoded device configuration.
+        _configuration (Optional[str]): Cached decoded device configuration.
+        _serial_number (Optional[str]): Cached serial number.
     """
 
+    __slots__ = (
+        '_connection',
+        '_seq',
+        '_inflight',
+        '_base_time',
+        '_spectrum_format_version',
+        '_configuration_raw',
+        '_configuration',
+        '_serial_number',
+    )
+
     def __init__(
         self,
         bluetooth_mac: Optional[str] = None,
@@ -57,8 +133,13 @@ class RadiaCode:
         Raises:
             Exception: If firmware version is incompatible.
         """
-        # Initialize sequence number
+        # Initialize sequence number and queue of sent, not yet answered request headers
         self._seq = 0
+        self._inflight: Deque[bytes] = deque()
+        # Device info that does not change during a session, filled in on first use
+        self._configuration_raw: Optional[bytes] = None
+        self._configuration: Optional[str] = None
+        self._serial_number: Optional[str] = None
         # Set connection type based on input
         if bluetooth_mac is not None:
             self._connection = Bluetooth(bluetooth_mac)
@@ -67,23 +148,28 @@ class RadiaCode:
 
         # Initialization routine
         self.execute(b'\x07\x00', b'\x01\xff\x12\xff')  # Execute initialization command
+        # Once the device is initialized, the independent setup commands are pipelined
         self._base_time = datetime.datetime.now()  # Set base time to current time
-        self.set_local_time(self._base_time)  # Set device local time
-        self.device_time(0)  # Initialize device time
+        _, device_time_resp, fw_version_resp = self.execute_pipelined(
+            [
+                (b'\x04\x0a', _local_time_args(self._base_time)),  # Set device local time
+                (b'\x25\x08', _write_request_args(VSFR.DEVICE_TIME, _U32.pack(0))),  # Initialize device time
+                (b'\x0a\x00', None),  # Firmware version
+            ]
+        )
+        _check_write_response(device_time_resp)
 
         # Check firmware compatibility
-        (_, (vmaj, vmin, _)) = self.fw_version()
+        (_, (vmaj, vmin, _)) = _decode_fw_version(fw_version_resp)
         if ignore_firmware_compatibility_check is False and vmaj < 4 or (vmaj == 4 and vmin < 8):
             raise Exception(
                 f'Incompatible firmware version {vmaj}.{vmin}, >=4.8 required. Upgrade device firmware or use radiacode==0.2.2'
             )
 
         # Get spectrum format version from device configuration
-        self._spectrum_format_version = 0
-        for line in self.configuration().split('\n'):
-            if line.startswith('SpecFormatVersion'):
-                self._spectrum_format_version = int(line.split('=')[1])
-                break
+        self._configuration_raw = self.read_request(VS.CONFIGURATION).data()
+        m = _SPEC_FORMAT_VERSION_RE.search(self._configuration_raw)
+        self._spectrum_format_version = int(m.group(1)) if m else 0
 
     def base_time(self) -> datetime.datetime:
         """
@@ -105,24 +191,88 @@ class RadiaCode:
         Returns:
             BytesBuffer: The response from the device.
         """
+        return self._wait(self._submit(reqtype, args))
+
+    def execute_nowait(self, reqtype: bytes, args: Optional[bytes] = None) -> None:
+        """
+        Send a command without waiting for its response.
+
+        The response is read and its header checked by the next command that waits
+        for its own response; its content is discarded. Errors reading it (timeout,
+        ProtocolError) are therefore raised by that next command. Once _MAX_UNREAD_ACKS
+        responses are pending they are drained before sending, so the 5-bit sequence
+        number cannot wrap onto an unread request.
+
+        Args:
+            reqtype (bytes): The request type.
+            args (Optional[bytes]): Additional arguments for the command.
+        """
+        if len(self._inflight) >= _MAX_UNREAD_ACKS:
+            self._wait(self._inflight[-1])
+        self._submit(reqtype, args)
+
+    def execute_pipelined(self, requests: List[Tuple[bytes, Optional[bytes]]]) -> List[BytesBuffer]:
+        """
+        Execute several commands, keeping up to _PIPELINE_DEPTH of them in flight.
+
+        The next request is sent before the response to the previous one has been read, so
+        back-to-back commands do not pay a full round-trip each. Responses are matched to
+        requests by their sequence-numbered headers.
+
+        Args:
+            requests (List[Tuple[bytes, Optional[bytes]]]): (reqtype, args) pairs.
+
+        Returns:
+            List[BytesBuffer]: The responses, in request order.
+        """
+        ret = []
+        pending: Deque[bytes] = deque()
+        for reqtype, args in requests:
+            if len(pending) >= _PIPELINE_DEPTH:
+                ret.append(self._wait(pending.popleft()))
+            pending.append(self._submit(reqtype, args))
+        while pending:
+            ret.append(self._wait(pending.popleft()))
+        return ret
+
+    def _submit(self, reqtype: bytes, args: Optional[bytes] = None) -> bytes:
         # Ensure request type has correct length
         assert len(reqtype) == 2
         # Generate sequence number
         req_seq_no = 0x80 + self._seq
         self._seq = (self._seq + 1) % 32
 
-        # Construct request packet
-        req_header = reqtype + b'\x00' + struct.pack('<B', req_seq_no)
-        request = req_header + (args or b'')
-        full_request = struct.pack('<I', len(request)) + request
-
-        # Send request and receive response
-        response = self._connection.execute(full_request)
-        # Extract response header
-        resp_header = response.unpack('<4s')[0]
-        # Check if response header matches request header
-        assert req_header == resp_header, f'req={req_header.hex()} resp={resp_header.hex()}'
-        return response
+        # Construct request packet: length, request type, zero byte and sequence number in one pack.
+        # The reqtype + zero byte prefix is written by the pack itself, so no per-reqtype
+        # prefix needs to be built or cached.
+        args_b = args or b''
+        full_request = _REQ_HDR.pack(4 + len(args_b), reqtype, 0, req_seq_no) + args_b
+        req_header = full_request[4:8]
+
+        self._connection.send(full_request)
+        self._inflight.append(req_header)
+        return req_header
+
+    def _wait(self, req_header: bytes) -> BytesBuffer:
+        # The device answers in submission order; responses to requests submitted
+        # before req_header have no reader and are only checked, then dropped.
+        # A header leaves the queue only once its reply has been read, so a failed receive()
+        # can be retried. On a mismatch the queue and the reply stream can no longer be
+        # matched up, so both are dropped.
+        while self._inflight:
+            expected = self._inflight[0]
+            response = self._connection.receive()
+            # Extract response header
+            resp_header = response.unpack_struct(_HDR)[0]
+            # Check if response header matches request header
+            if expected != resp_header:
+                self._inflight.clear()
+                self._connection.flush()
+                raise ProtocolError(f'req={expected.hex()} resp={resp_header.hex()}')
+            self._inflight.popleft()
+            if expected == req_header:
+                return response
+        raise ProtocolError(f'req={req_header.hex()} is not in flight')
 
     def read_request(self, command_id: Union[int, VS, VSFR]) -> BytesBuffer:
         """
@@ -134,12 +284,12 @@ class RadiaCode:
         Returns:
             BytesBuffer: The response from the device.
         """
-        r = self.execute(b'\x26\x08', struct.pack('<I', int(command_id)))
-        retcode, flen = r.unpack('<II')
+        r = self.execute(b'\x26\x08', _U32.pack(int(command_id)))
+        retcode, flen = r.unpack_struct(_II)
         assert retcode == 1, f'{command_id}: got retcode {retcode}'
         # HACK: workaround for new firmware bug(?)
-        if r.size() == flen + 1 and r._data[-1] == 0x00:
-            r._data = r._data[:-1]
+        if r.size() == flen + 1 and r._data[r._limit - 1] == 0x00:
+            r._limit -= 1
         # END OF HACK
         assert r.size() == flen, f'{command_id}: got size {r.size()}, expect {flen}'
         return r
@@ -155,10 +305,12 @@ class RadiaCode:
         Raises:
             AssertionError: If response code is not as expected.
         """
-        r = self.execute(b'\x25\x08', struct.pack('<I', int(command_id)) + (data or b''))
-        retcode = r.unpack('<I')[0]
-        assert retcode == 1
-        assert r.size() == 0
+        r = self.execute(b'\x25\x08', _write_request_args(command_id, data))
+        _check_write_response(r)
+
+    def _write_vs(self, command_id: Union[int, VS], payload: bytes = b'') -> None:
+        r = self.execute(b'\x27\x08', _II.pack(int(command_id), len(payload)) + payload)
+        _check_write_response(r)
 
     def batch_read_vsfrs(self, vsfr_ids: List[VSFR]) -> List[int]:
         """
@@ -171,11 +323,29 @@ class RadiaCode:
             List[int]: List of VSFR values.
         """
         assert len(vsfr_ids)
-        r = self.execute(b'\x2a\x08', b''.join(struct.pack('<I', int(c)) for c in vsfr_ids))
-        ret = [r.unpack('<I')[0] for _ in range(len(vsfr_ids))]
+        r = self.execute(b'\x2a\x08', b''.join(map(_U32.pack, map(int, vsfr_ids))))
+        ret = list(r.unpack_all_u32(len(vsfr_ids)))
         assert r.size() == 0
         return ret
 
+    def batch_write_vsfrs(self, vsfrs: List[Tuple[VSFR, int]]) -> None:
+        """
+        Batch write u32 VSFR values to the device.
+
+        The device has no multi-VSFR write command, so the writes are pipelined
+        instead of waiting for each acknowledgement in turn. Only _PIPELINE_DEPTH (2)
+        writes are in flight at a time, so each write overlaps just the next one.
+
+        Args:
+            vsfrs (List[Tuple[VSFR, int]]): (VSFR ID, value) pairs to write.
+
+        Raises:
+            AssertionError: If a response code is not as expected.
+        """
+        assert len(vsfrs)
+        for r in self.execute_pipelined([(b'\x25\x08', _write_request_args(c, _U32.pack(v))) for c, v in vsfrs]):
+            _check_write_response(r)
+
     def status(self) -> str:
         """
         Get the status of the device.
@@ -184,19 +354,19 @@ class RadiaCode:
             str: The status of the device.
         """
         r = self.execute(b'\x05\x00')
-        flags = r.unpack('<I')
+        flags = r.unpack_struct(_U32)
         assert r.size() == 0
         return f'status flags: {flags}'
 
     def set_local_time(self, dt: datetime.datetime) -> None:
         """
-        Set the local time of the device.
+        Set the local time of the device. The acknowledgement is not waited for: it is
+        checked by the next command, which raises if the device rejected it or timed out.
 
         Args:
             dt (datetime.datetime): The local time to set.
         """
-        d = struct.pack('<BBBBBBBB', dt.day, dt.month, dt.year - 2000, 0, dt.second, dt.minute, dt.hour, 0)
-        self.execute(b'\x04\x0a', d)
+        self.execute_nowait(b'\x04\x0a', _local_time_args(dt))
 
     def fw_signature(self) -> str:
         """
@@ -206,7 +376,7 @@ class RadiaCode:
             str: The firmware signature.
         """
         r = self.execute(b'\x01\x01')
-        signature = r.unpack('<I')[0]
+        signature = r.unpack_u32()
         filename = r.unpack_string()
         idstring = r.unpack_string()
         return f'Signature: {signature:08X}, FileName="{filename}", IdString="{idstring}"'
@@ -219,12 +389,7 @@ class RadiaCode:
             tuple[tuple[int, int, str], tuple[int, int, str]]: The boot and target firmware versions.
         """
         r = self.execute(b'\x0a\x00')
-        boot_minor, boot_major = r.unpack('<HH')
-        boot_date = r.unpack_string()
-        target_minor, target_major = r.unpack('<HH')
-        target_date = r.unpack_string()
-        assert r.size() == 0
-        return ((boot_major, boot_minor, boot_date), (target_major, target_minor, target_date.strip('\x00')))
+        return _decode_fw_version(r)
 
     def hw_serial_number(self) -> str:
         """
@@ -234,21 +399,24 @@ class RadiaCode:
             str: The hardware serial number.
         """
         r = self.execute(b'\x0b\x00')
-        serial_len = r.unpack('<I')[0]
+        serial_len = r.unpack_u32()
         assert serial_len % 4 == 0
-        serial_groups = [r.unpack('<I')[0] for _ in range(serial_len // 4)]
+        serial_groups = r.unpack_all_u32(serial_len // 4)
         assert r.size() == 0
         return '-'.join(f'{v:08X}' for v in serial_groups)
 
     def configuration(self) -> str:
         """
-        Get the device configuration.
+        Get the device configuration. It is read once per connection and cached.
 
         Returns:
             str: The device configuration.
         """
-        r = self.read_request(VS.CONFIGURATION)
-        return r.data().decode('cp1251')
+        if self._configuration is None:
+            if self._configuration_raw is None:
+                self._configuration_raw = self.read_request(VS.CONFIGURATION).data()
+            self._configuration = _cp1251_decode(self._configuration_raw)[0]
+        return self._configuration
 
     def text_message(self) -> str:
         """
@@ -258,17 +426,19 @@ class RadiaCode:
             str: The text message.
         """
         r = self.read_request(VS.TEXT_MESSAGE)
-        return r.data().decode('ascii')
+        return _ascii_decode(r.data())[0]
 
     def serial_number(self) -> str:
         """
-        Get the serial number of the device.
+        Get the serial number of the device. It is read once per connection and cached.
 
         Returns:
             str: The serial number.
         """
-        r = self.read_request(8)
-        return r.data().decode('ascii')
+        if self._serial_number is None:
+            r = self.read_request(8)
+            self._serial_number = _ascii_decode(r.data())[0]
+        return self._serial_number
 
     def commands(self) -> str:
         """
@@ -278,7 +448,7 @@ class RadiaCode:
             str: The available commands.
         """
         br = self.read_request(257)
-        return br.data().decode('ascii')
+        return _ascii_decode(br.data())[0]
 
     # called with 0 after init!
     def device_time(self, v: int) -> None:
@@ -288,7 +458,7 @@ class RadiaCode:
         Args:
             v (int): The time value to set.
         """
-        self.write_request(VSFR.DEVICE_TIME, struct.pack('<I', v))
+        self.write_request(VSFR.DEVICE_TIME, _U32.pack(v))
 
     def data_buf(self) -> List[Union[DoseRateDB, RareData, RealTimeData, RawData, Event]]:
         """
@@ -326,10 +496,7 @@ class RadiaCode:
 
     def spectrum_reset(self) -> None:
         """Reset spectrum on the device."""
-        r = self.execute(b'\x27\x08', struct.pack('<II', int(VS.SPECTRUM), 0))
-        retcode = r.unpack('<I')[0]
-        assert retcode == 1
-        assert r.size() == 0
+        self._write_vs(VS.SPECTRUM)
 
     # used in spectrum_channel_to_energy
     def energy_calib(self) -> List[float]:
@@ -340,7 +507,23 @@ class RadiaCode:
             List[float]: Energy calibration coefficients.
         """
         r = self.read_request(VS.ENERGY_CALIB)
-        return list(r.unpack('<fff'))
+        return list(r.unpack_struct(_FFF))
+
+    def energy_axis(self, n: int) -> List[float]:
+        """
+        Get the energies of the first n spectrum channels.
+
+        Fetches the calibration once instead of per channel. For a NumPy array, pass
+        np.arange(n) and the energy_calib() coefficients to spectrum_channel_to_energy.
+
+        Args:
+            n (int): Number of channels, usually len(spectrum.counts).
+
+        Returns:
+            List[float]: Energy of each channel.
+        """
+        a0, a1, a2 = self.energy_calib()
+        return [spectrum_channel_to_energy(c, a0, a1, a2) for c in range(n)]
 
     def set_energy_calib(self, coef: List[float]) -> None:
         """
@@ -353,10 +536,7 @@ class RadiaCode:
             AssertionError: If number of coefficients is not equal to 3.
         """
         assert len(coef) == 3
-        pc = struct.pack('<fff', *coef)
-        r = self.execute(b'\x27\x08', struct.pack('<II', int(VS.ENERGY_CALIB), len(pc)) + pc)
-        retcode = r.unpack('<I')[0]
-        assert retcode == 1
+        self._write_vs(VS.ENERGY_CALIB, _FFF.pack(*coef))
 
     def set_language(self, lang='ru') -> None:
         """
@@ -369,7 +549,7 @@ class RadiaCode:
             AssertionError: If language value is not supported.
         """
         assert lang in {'ru', 'en'}, 'unsupported lang value - use "ru" or "en"'
-        self.write_request(VSFR.DEVICE_LANG, struct.pack('<I', bool(lang == 'en')))
+        self.write_request(VSFR.DEVICE_LANG, _U32.pack(bool(lang == 'en')))
 
     def set_device_on(self, on: bool):
         """
@@ -382,7 +562,7 @@ class RadiaCode:
             AssertionError: If on value is True.
         """
         assert not on, 'only False value accepted'
-        self.write_request(VSFR.DEVICE_ON, struct.pack('<I', bool(on)))
+        self.write_request(VSFR.DEVICE_ON, _U32.pack(bool(on)))
 
     def set_sound_on(self, on: bool) -> None:
         """
@@ -391,7 +571,7 @@ class RadiaCode:
         Args:
             on (bool): If True, turns sound on. If False, turns sound off.
         """
-        self.write_request(VSFR.SOUND_ON, struct.pack('<I', bool(on)))
+        self.write_request(VSFR.SOUND_ON, _U32.pack(bool(on)))
 
     def set_vibro_on(self, on: bool) -> None:
         """
@@ -400,7 +580,7 @@ class RadiaCode:
         Args:
             on (bool): If True, turns vibration on. If False, turns vibration off.
         """
-        self.write_request(VSFR.SOUND_ON, struct.pack('<I', bool(on)))
+        self.write_request(VSFR.VIBRO_ON, _U32.pack(bool(on)))
 
     def set_sound_ctrl(self, ctrls: List[CTRL]) -> None:
         """
@@ -409,10 +589,8 @@ class RadiaCode:
         Args:
             ctrls (List[CTRL]): List of sound control flags.
         """
-        flags = 0
-        for c in ctrls:
-            flags |= int(c)
-        self.write_request(VSFR.SOUND_CTRL, struct.pack('<I', flags))
+        flags = reduce(or_, map(int, ctrls), 0)
+        self.write_request(VSFR.SOUND_CTRL, _U32.pack(flags))
 
     def set_display_off_time(self, seconds: int) -> None:
         """
@@ -426,7 +604,7 @@ class RadiaCode:
         """
         assert seconds in {5, 10, 15, 30}
         v = 3 if seconds == 30 else (seconds // 5) - 1
-        self.write_request(VSFR.DISP_OFF_TIME, struct.pack('<I', v))
+        self.write_request(VSFR.DISP_OFF_TIME, _U32.pack(v))
 
     def set_display_brightness(self, brightness: int) -> None:
         """
@@ -439,7 +617,7 @@ class RadiaCode:
             AssertionError: If brightness value is not valid.
         """
         assert 0 <= brightness and brightness <= 9
-        self.write_request(VSFR.DISP_BRT, struct.pack('<I', brightness))
+        self.write_request(VSFR.DISP_BRT, _U32.pack(brightness))
 
     def set_display_direction(self, direction: DisplayDirection) -> None:
         """
@@ -449,7 +627,7 @@ class RadiaCode:
             direction (DisplayDirection): Display direction.
         """
         assert isinstance(direction, DisplayDirection)
-        self.write_request(VSFR.DISP_DIR, struct.pack('<I', int(direction)))
+        self.write_request(VSFR.DISP_DIR, _U32.pack(int(direction)))
 
     def set_vibro_ctrl(self, ctrls: List[CTRL]) -> None:
         """
@@ -461,8 +639,6 @@ class RadiaCode:
         Raises:
             AssertionError: If CTRL.CLICKS is present in ctrls.
         """
-        flags = 0
-        for c in ctrls:
-            assert c != CTRL.CLICKS, 'CTRL.CLICKS not supported for vibro'
-            flags |= int(c)
-        self.write_request(VSFR.VIBRO_CTRL, struct.pack('<I', flags))
+        assert CTRL.CLICKS not in ctrls, 'CTRL.CLICKS not supported for vibro'
+        flags = reduce(or_, map(int, ctrls), 0)
+        self.write_request(VSFR.VIBRO_CTRL, _U32.pack(flags))
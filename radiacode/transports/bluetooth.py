@@ -1,4 +1,5 @@
 import struct
+from collections import deque
 
 from bluepy.btle import BTLEDisconnectError, DefaultDelegate, Peripheral
 
@@ -11,9 +12,9 @@ class DeviceNotFound(Exception):
 
 class Bluetooth(DefaultDelegate):
     def __init__(self, mac):
-        self._resp_buffer = b''
+        self._resp_buffer = bytearray()
         self._resp_size = 0
-        self._response = None
+        self._responses: deque[bytearray] = deque()
 
         try:
             self.p = Peripheral(mac)
@@ -30,23 +31,34 @@ class Bluetooth(DefaultDelegate):
     def handleNotification(self, chandle, data):
         if self._resp_size == 0:
             self._resp_size = 4 + struct.unpack('<i', data[:4])[0]
-            self._resp_buffer = data[4:]
+            self._resp_buffer = bytearray(data[4:])
         else:
             self._resp_buffer += data
         self._resp_size -= len(data)
         assert self._resp_size >= 0
         if self._resp_size == 0:
-            self._response = self._resp_buffer
-            self._resp_buffer = b''
+            self._responses.append(self._resp_buffer)
+            self._resp_buffer = bytearray()
 
     def execute(self, req) -> BytesBuffer:
+        self.send(req)
+        return self.receive()
+
+    def send(self, req) -> None:
         for pos in range(0, len(req), 18):
             rp = req[pos : min(pos + 18, len(req))]
             self.p.writeCharacteristic(self.write_fd, rp)
 
-        while self._response is None:
+    def flush(self) -> None:
+        # Drop any unread replies
+        while self.p.waitForNotifications(0.1):
+            pass
+        self._resp_buffer = bytearray()
+        self._resp_size = 0
+        self._responses.clear()
+
+    def receive(self) -> BytesBuffer:
+        while not self._responses:
             self.p.waitForNotifications(2.0)
 
-        br = BytesBuffer(self._response)
-        self._response = None
-        return br
+        return BytesBuffer(self._responses.popleft())
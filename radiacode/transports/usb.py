@@ -1,10 +1,33 @@
+import os
 import struct
+import warnings
+from typing import Union
 
 import usb.core
 
 from radiacode.bytes_buffer import BytesBuffer
 
 
+# Bulk IN transfer size. Smaller transfers let the device ship partial data before the host
+# polling window closes; going below 4K hurts throughput, so sizes are clamped to that.
+# Can be overridden with the RADIACODE_USB_CHUNK_SIZE environment variable. A larger chunk
+# also makes it more likely that one read runs on into the next pipelined reply, which
+# Usb.receive() then has to keep as surplus.
+MIN_CHUNK_SIZE = 4096
+DEFAULT_CHUNK_SIZE = 8192
+
+
+def _chunk_size_from_env() -> int:
+    value = os.environ.get('RADIACODE_USB_CHUNK_SIZE')
+    if value is None:
+        return DEFAULT_CHUNK_SIZE
+    try:
+        return int(value)
+    except ValueError:
+        warnings.warn(f'Invalid RADIACODE_USB_CHUNK_SIZE={value!r}, using {DEFAULT_CHUNK_SIZE}', stacklevel=3)
+        return DEFAULT_CHUNK_SIZE
+
+
 class DeviceNotFound(Exception):
     pass
 
@@ -18,7 +41,7 @@ class MultipleUSBReadFailure(Exception):
 
 
 class Usb:
-    def __init__(self, serial_number=None, timeout_ms=3000):
+    def __init__(self, serial_number=None, timeout_ms=3000, chunk_size=None):
         _vid = 0x0483
         _pid = 0xF123
 
@@ -29,33 +52,56 @@ class Usb:
             # rather than ignoring it as a match condition.
             self._device = usb.core.find(idVendor=_vid, idProduct=_pid)
         self._timeout_ms = timeout_ms
+        self._chunk_size = max(MIN_CHUNK_SIZE, chunk_size if chunk_size is not None else _chunk_size_from_env())
+        # Bytes read past the end of the previous reply, see receive()
+        self._surplus: Union[bytes, memoryview] = b''
         if self._device is None:
             raise DeviceNotFound
+        self.flush()
+
+    def flush(self) -> None:
+        # Drop any unread replies
+        self._surplus = b''
         while True:
             try:
-                self._device.read(0x81, 256, timeout=100)
+                self._device.read(0x81, self._chunk_size, timeout=100)
             except usb.core.USBTimeoutError:
                 break
 
     def execute(self, request: bytes) -> BytesBuffer:
+        self.send(request)
+        return self.receive()
+
+    def send(self, request: bytes) -> None:
         self._device.write(0x1, request)
 
+    def receive(self) -> BytesBuffer:
+        # A bulk read may run past the end of a reply into the next pipelined one: a reply whose
+        # length is a multiple of the packet size ends without a short packet. Such surplus bytes
+        # are kept and the next reply is served from them before the device is read again.
+        data = self._surplus
+        self._surplus = b''
+        if len(data) < 4:
+            data = bytearray(data) + self._read_nonempty() if data else self._read_nonempty()
+
+        # The response is handed out as a view past the length prefix; a copy is only made
+        # when it spans several reads and has to be joined
+        total_length = 4 + struct.unpack_from('<I', data)[0]
+        if len(data) < total_length:
+            data = bytearray(data)
+            while len(data) < total_length:
+                data += self._device.read(0x81, min(total_length - len(data), self._chunk_size))
+        if len(data) > total_length:
+            self._surplus = memoryview(data)[total_length:]
+
+        return BytesBuffer(memoryview(data)[4:total_length])
+
+    def _read_nonempty(self):
         trials = 0
         max_trials = 3
         while trials < max_trials:  # repeat until non-zero lenght data received
-            data = self._device.read(0x81, 256, timeout=self._timeout_ms).tobytes()
+            data = self._device.read(0x81, self._chunk_size, timeout=self._timeout_ms)
             if len(data) != 0:
-                break
-            else:
-                trials += 1
-        if trials >= max_trials:
-            raise MultipleUSBReadFailure(str(trials) + ' USB Read Failures in sequence')
-
-        response_length = struct.unpack_from('<I', data)[0]
-        data = data[4:]
-
-        while len(data) < response_length:
-            r = self._device.read(0x81, response_length - len(data)).tobytes()
-            data += r
-
-        return BytesBuffer(data)
+                return data
+            trials += 1
+        raise MultipleUSBReadFailure(str(trials) + ' USB Read Failures in sequence')
@@ -0,0 +1,231 @@
+import array
+import struct
+from collections import deque
+
+import pytest
+
+from radiacode import VSFR, ProtocolError, RadiaCode
+from radiacode.bytes_buffer import BytesBuffer
+from radiacode.decoders.spectrum import decode_counts_v0
+from radiacode.transports.usb import DEFAULT_CHUNK_SIZE, Usb, _chunk_size_from_env
+
+
+class FakeTransport:
+    """Answers every request with its own header followed by the request args"""
+
+    def __init__(self):
+        self.sent = []
+        self.replies = deque()
+        self.max_outstanding = 0
+
+    def send(self, request):
+        assert struct.unpack_from('<I', request)[0] == len(request) - 4
+        self.sent.append(request)
+        self.replies.append(request[4:])
+        self.max_outstanding = max(self.max_outstanding, len(self.replies))
+
+    def receive(self):
+        return BytesBuffer(self.replies.popleft())
+
+    def flush(self):
+        self.replies.clear()
+
+
+class FakeUsbDevice:
+    """Returns queued data in bulk reads of at most the requested size, like a device that never sends a short packet"""
+
+    def __init__(self, data):
+        self.data = bytes(data)
+
+    def read(self, ep, size, timeout=None):
+        chunk, self.data = self.data[:size], self.data[size:]
+        return array.array('B', chunk)
+
+
+def make_radiacode(transport):
+    rc = RadiaCode.__new__(RadiaCode)
+    rc._seq = 0
+    rc._inflight = deque()
+    rc._connection = transport
+    return rc
+
+
+def make_usb(data):
+    u = Usb.__new__(Usb)
+    u._device = FakeUsbDevice(data)
+    u._timeout_ms = 100
+    u._chunk_size = 8192
+    u._surplus = b''
+    return u
+
+
+def test_execute_returns_payload():
+    rc = make_radiacode(FakeTransport())
+    r = rc.execute(b'\x0a\x00', b'\x01\x02')
+    assert r.data() == b'\x01\x02'
+    assert not rc._inflight
+
+
+def test_execute_pipelined_keeps_order_and_depth():
+    t = FakeTransport()
+    rc = make_radiacode(t)
+    rs = rc.execute_pipelined([(b'\x0a\x00', bytes([i])) for i in range(5)])
+    assert [r.data() for r in rs] == [bytes([i]) for i in range(5)]
+    assert t.max_outstanding == 2
+    assert not rc._inflight
+
+
+def test_execute_nowait_ack_drained_by_next_execute():
+    t = FakeTransport()
+    rc = make_radiacode(t)
+    rc.execute_nowait(b'\x04\x0a', b'\xaa')
+    assert len(rc._inflight) == 1
+    assert rc.execute(b'\x0a\x00', b'\xbb').data() == b'\xbb'
+    assert not rc._inflight and not t.replies
+
+
+def test_execute_nowait_bounds_unread_acks():
+    t = FakeTransport()
+    rc = make_radiacode(t)
+    for _ in range(40):
+        rc.execute_nowait(b'\x04\x0a')
+        assert len(rc._inflight) <= 4
+    assert len(t.replies) == len(rc._inflight)
+
+
+def test_header_mismatch_raises():
+    t = FakeTransport()
+    rc = make_radiacode(t)
+    rc.execute_nowait(b'\x0a\x00')
+    t.replies[0] = b'\x0a\x00\x00\x9f'
+    with pytest.raises(ProtocolError):
+        rc.execute(b'\x0a\x00')
+    # queue and transport were reset, so later commands work again
+    assert not rc._inflight and not t.replies
+    assert rc.execute(b'\x0a\x00', b'\x01').data() == b'\x01'
+
+
+def test_failed_receive_keeps_request_in_flight():
+    class FlakyTransport(FakeTransport):
+        fail = True
+
+        def receive(self):
+            if self.fail:
+                self.fail = False
+                raise TimeoutError
+            return super().receive()
+
+    rc = make_radiacode(FlakyTransport())
+    req_header = rc._submit(b'\x0a\x00', b'\x01')
+    with pytest.raises(TimeoutError):
+        rc._wait(req_header)
+    assert list(rc._inflight) == [req_header]
+    assert rc._wait(req_header).data() == b'\x01'
+
+
+def test_usb_receive_keeps_bytes_past_reply():
+    first = struct.pack('<I', 60) + bytes(range(60))
+    second = struct.pack('<I', 8) + b'\x01' * 8
+    u = make_usb(first + second)
+    assert u.receive().data() == bytes(range(60))
+    assert u.receive().data() == b'\x01' * 8
+    assert not u._surplus
+
+
+def test_usb_chunk_size_env(monkeypatch):
+    monkeypatch.setenv('RADIACODE_USB_CHUNK_SIZE', '16384')
+    assert _chunk_size_from_env() == 16384
+    monkeypatch.setenv('RADIACODE_USB_CHUNK_SIZE', 'big')
+    with pytest.warns(UserWarning):
+        assert _chunk_size_from_env() == DEFAULT_CHUNK_SIZE
+
+
+class HandshakeTransport(FakeTransport):
+    """Answers the connection handshake and records how many replies were read before each request"""
+
+    def __init__(self, fw_version):
+        super().__init__()
+        self.fw_version = fw_version
+        self.received = 0
+        self.log = []
+
+    def send(self, request):
+        reqtype = request[4:6]
+        self.log.append((reqtype, self.received))
+        if reqtype == b'\x0a\x00':
+            body = struct.pack('<HH', 0, 4) + b'\x00' + struct.pack('<HH', self.fw_version[1], self.fw_version[0]) + b'\x00'
+        elif reqtype == b'\x26\x08':
+            payload = b'SpecFormatVersion=1\n'
+            body = struct.pack('<II', 1, len(payload)) + payload
+        elif reqtype == b'\x25\x08':
+            body = struct.pack('<I', 1)
+        else:
+            body = b''
+        self.replies.append(request[4:8] + body)
+
+    def receive(self):
+        self.received += 1
+        return super().receive()
+
+
+def test_handshake_order(monkeypatch):
+    t = HandshakeTransport((4, 12))
+    monkeypatch.setattr('radiacode.radiacode.Usb', lambda serial_number: t)
+    rc = RadiaCode()
+    assert rc._spectrum_format_version == 1
+    # init is answered before anything else is sent; configuration waits for the firmware version
+    assert t.log == [(b'\x07\x00', 0), (b'\x04\x0a', 1), (b'\x25\x08', 1), (b'\x0a\x00', 2), (b'\x26\x08', 4)]
+
+
+def test_handshake_old_firmware(monkeypatch):
+    t = HandshakeTransport((4, 7))
+    monkeypatch.setattr('radiacode.radiacode.Usb', lambda serial_number: t)
+    with pytest.raises(Exception, match='Incompatible firmware version 4.7'):
+        RadiaCode()
+    assert b'\x26\x08' not in [reqtype for reqtype, _ in t.log]
+
+
+def test_energy_axis(monkeypatch):
+    rc = make_radiacode(FakeTransport())
+    monkeypatch.setattr(rc.__class__, 'energy_calib', lambda self: [1.0, 2.0, 0.5])
+    assert rc.energy_axis(4) == [1.0, 3.5, 7.0, 11.5]
+
+
+def test_decode_counts_v0():
+    assert decode_counts_v0(BytesBuffer(struct.pack('<3I', 1, 2, 3))) == [1, 2, 3]
+    with pytest.raises(Exception, match='not a whole number'):
+        decode_counts_v0(BytesBuffer(struct.pack('<3I', 1, 2, 3) + b'\x00'))
+
+
+class WriteTransport(FakeTransport):
+    """Acknowledges every write with the given retcode"""
+
+    def __init__(self, retcode=1):
+        super().__init__()
+        self.retcode = retcode
+
+    def send(self, request):
+        super().send(request)
+        self.replies[-1] = request[4:8] + struct.pack('<I', self.retcode)
+
+
+def test_set_vibro_on_writes_vibro_register():
+    t = WriteTransport()
+    make_radiacode(t).set_vibro_on(False)
+    assert t.sent == [struct.pack('<I2sBBII', 12, b'\x25\x08', 0, 0x80, 1329, 0)]
+
+
+def test_batch_write_vsfrs():
+    t = WriteTransport()
+    make_radiacode(t).batch_write_vsfrs([(VSFR.SOUND_ON, 1), (VSFR.DISP_BRT, 7)])
+    assert t.sent == [
+        struct.pack('<I2sBBII', 12, b'\x25\x08', 0, 0x80, 1314, 1),
+        struct.pack('<I2sBBII', 12, b'\x25\x08', 0, 0x81, 1297, 7),
+    ]
+    assert t.max_outstanding == 2
+
+
+def test_batch_write_vsfrs_bad_retcode():
+    t = WriteTransport(retcode=0)
+    with pytest.raises(AssertionError):
+        make_radiacode(t).batch_write_vsfrs([(VSFR.SOUND_ON, 1)])